@@ -27,6 +27,44 @@ class Interface:
         """
         self.screen.fill(pygame.Color('darkslategray'))
 
+    def show_snapshot(self, snapshot):
+        """
+        Draw the shapes of a render snapshot published by the physics worker.
+        :param snapshot: RenderSnapshot to draw
+        :return: None
+        """
+        outline_color = (44, 62, 80, 255)
+
+        for shape in snapshot.shapes:
+            if shape.kind == 'circle':
+                center = shape.points[0]
+                pygame.draw.circle(
+                    self.screen,
+                    shape.color,
+                    center,
+                    shape.radius
+                )
+
+                pygame.draw.line(
+                    self.screen,
+                    outline_color,
+                    center,
+                    pygame.Vector2(center) + pygame.Vector2(
+                        shape.radius, 0
+                    ).rotate_rad(shape.angle)
+                )
+            elif shape.kind == 'poly':
+                pygame.draw.polygon(self.screen, shape.color, shape.points)
+            elif shape.kind == 'segment':
+                width = max(1, int(shape.radius * 2))
+                pygame.draw.line(
+                    self.screen,
+                    shape.color,
+                    shape.points[0],
+                    shape.points[1],
+                    width
+                )
+
     def show_gui_data(self, score, hp):
         """
         Display game instructions and data in the GUI.
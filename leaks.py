@@ -0,0 +1,274 @@
+import collections
+import gc
+import os
+import time
+import tracemalloc
+
+from typing import Deque, Dict, List, Optional
+
+
+class Checkpoint:
+    """
+    Counts recorded by the leak tracker at one point in time.
+    """
+    def __init__(self, elapsed: float, counts: Dict[str, int],
+                 top_types: List[tuple], rss: Optional[int],
+                 allocations: List[str]):
+        self.elapsed = elapsed
+        self.counts = counts
+        self.top_types = top_types
+        self.rss = rss
+        self.allocations = allocations
+
+
+def resident_set_size() -> Optional[int]:
+    """
+    Get the current resident set size of this process.
+    :return: RSS in bytes, or None if /proc is not available
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def max_resident_set_size() -> Optional[int]:
+    """
+    Get the peak resident set size of this process.
+    :return: Peak RSS in bytes, or None if it cannot be read on this platform
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    # Reported in KiB on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if os.uname().sysname == 'Darwin' else max_rss * 1024
+
+
+class LeakTracker:
+    """
+    Periodically records live object counts, space sizes and RSS during a
+    session and flags values that keep growing. Each checkpoint is appended to
+    the report as it is taken, so the report survives a crash or kill, and
+    only the checkpoints needed for the growth check are kept in memory.
+    """
+    game_types = ('Target', 'Missile', 'Player', 'Segment', 'Circle', 'Poly')
+    traceback_frames = 10
+
+    def __init__(self, interval: float = 30, trace_malloc: bool = False,
+                 report_path: str = 'leak_report.txt',
+                 growth_checkpoints: int = 3, top_types: int = 15):
+        self.interval = interval
+        self.trace_malloc = trace_malloc
+        self.report_path = report_path
+        self.growth_checkpoints = growth_checkpoints
+        self.top_types = top_types
+
+        self.checkpoints: Deque[Checkpoint] = collections.deque(
+            maxlen=growth_checkpoints + 1
+        )
+        self.final: Optional[Checkpoint] = None
+        self.flagged: List[str] = []
+
+        self._start = time.monotonic()
+        self._next_checkpoint = self._start
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+        if self.trace_malloc and not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_frames)
+
+        with open(self.report_path, 'w') as report_file:
+            report_file.write('Leak tracker report\n\n')
+
+    def maybe_checkpoint(self, app):
+        """
+        Record a checkpoint if the interval has passed since the last one. Must
+        be called from the thread that steps the space.
+        :param app: The running App
+        :return: None
+        """
+        if time.monotonic() < self._next_checkpoint:
+            return
+
+        self.checkpoint(app)
+
+    def checkpoint(self, app, final: bool = False):
+        """
+        Record live object counts, space sizes, RSS and, if enabled, the
+        largest allocation changes since the previous checkpoint, and append
+        them to the report. Counts that have just started growing at every
+        periodic checkpoint are printed and added to the report.
+        :param app: The running App
+        :param final: Whether this is the checkpoint taken at exit. It is
+        reported separately and left out of the growth check.
+        :return: None
+        """
+        now = time.monotonic()
+        self._next_checkpoint = now + self.interval
+
+        by_type = collections.Counter(
+            type(o).__name__ for o in gc.get_objects()
+        )
+
+        counts = {
+            'space_bodies': len(app.space.bodies),
+            'space_shapes': len(app.space.shapes),
+            'walls': len(app.space.static_body.shapes),
+            'targets': len(app.targets),
+            'flying_missiles': len(app.flying_missiles),
+        }
+
+        for name in self.game_types:
+            counts[f'live_{name}'] = by_type[name]
+
+        rss = resident_set_size()
+
+        if rss is not None:
+            counts['rss_bytes'] = rss
+        else:
+            rss = max_resident_set_size()
+
+            if rss is not None:
+                counts['max_rss_bytes'] = rss
+
+        allocations = []
+
+        if self.trace_malloc:
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__, all_frames=True),
+            ))
+
+            if self._snapshot is not None:
+                stats = snapshot.compare_to(self._snapshot, 'traceback')
+                allocations = [self.format_allocation(s) for s in stats[:10]]
+
+            self._snapshot = snapshot
+
+        c = Checkpoint(
+            now - self._start,
+            counts,
+            by_type.most_common(self.top_types),
+            rss,
+            allocations
+        )
+
+        if final:
+            self.final = c
+            self.append_to_report(self.format_checkpoint(c, 'Exit checkpoint'))
+            return
+
+        self.checkpoints.append(c)
+        lines = [self.format_checkpoint(c, 'Checkpoint')]
+
+        for name in self.growing():
+            if name in self.flagged:
+                continue
+
+            self.flagged.append(name)
+            warning = (
+                f'Leak tracker: {name} increased at each of the last '
+                f'{self.growth_checkpoints} checkpoints '
+                f'({c.counts[name]} at {c.elapsed:.1f}s)'
+            )
+            print(warning)
+            lines.append(warning + '\n')
+
+        self.append_to_report(''.join(lines))
+
+    def growing(self) -> List[str]:
+        """
+        Find the counts that increased at every one of the last
+        growth_checkpoints periodic checkpoints, compared with the checkpoint
+        before each.
+        :return: Names of the counts that grew monotonically
+        """
+        recent = list(self.checkpoints)
+
+        if len(recent) <= self.growth_checkpoints:
+            return []
+
+        names = []
+
+        for name in recent[-1].counts:
+            values = [c.counts.get(name, 0) for c in recent]
+
+            if all(a < b for a, b in zip(values, values[1:])):
+                names.append(name)
+
+        return names
+
+    @staticmethod
+    def format_checkpoint(c: Checkpoint, title: str) -> str:
+        """
+        Render a single checkpoint as text.
+        :param c: The checkpoint to render
+        :param title: Heading for the checkpoint
+        :return: The rendered checkpoint
+        """
+        lines = [f'{title} at {c.elapsed:.1f}s']
+
+        for name, value in c.counts.items():
+            lines.append(f'  {name}: {value}')
+
+        lines.append('  Most common live object types:')
+
+        for name, count in c.top_types:
+            lines.append(f'    {name}: {count}')
+
+        if c.allocations:
+            lines.append('  Largest allocation changes:')
+
+            for stat in c.allocations:
+                lines.append(f'    {stat}')
+
+        return '\n'.join(lines) + '\n\n'
+
+    @staticmethod
+    def format_allocation(stat: tracemalloc.StatisticDiff) -> str:
+        """
+        Render an allocation change with the call stack that made it.
+        :param stat: Difference in allocations at one call stack
+        :return: The rendered allocation change
+        """
+        frames = stat.traceback.format(most_recent_first=True)
+        lines = [
+            f'size={stat.size} B ({stat.size_diff:+} B), '
+            f'count={stat.count} ({stat.count_diff:+})'
+        ]
+
+        lines.extend(f'  {line.strip()}' for line in frames if line.strip())
+
+        return '\n    '.join(lines)
+
+    def append_to_report(self, text: str):
+        """
+        Append text to the report file.
+        :param text: Text to append
+        :return: None
+        """
+        with open(self.report_path, 'a') as report_file:
+            report_file.write(text)
+
+    def write_report(self, app):
+        """
+        Record the exit checkpoint and append a summary of every count that
+        grew during the session.
+        :param app: The App that has finished running
+        :return: None
+        """
+        self.checkpoint(app, final=True)
+
+        if self.flagged:
+            summary = (
+                f'Increased at each of {self.growth_checkpoints} consecutive '
+                f'checkpoints: {", ".join(self.flagged)}'
+            )
+        else:
+            summary = 'No monotonic growth detected.'
+
+        self.append_to_report(summary + '\n')
@@ -1,4 +1,6 @@
+import argparse
 import random
+import time
 
 import pygame
 import pymunk
@@ -8,8 +10,11 @@ from pymunk.vec2d import Vec2d
 from typing import Optional, List
 
 from gui import Interface
+from leaks import LeakTracker
+from metrics import Metrics, MetricsServer
 from player import Player
 from missile import Missile
+from pipeline import PhysicsWorker
 from target import Target
 
 
@@ -17,14 +22,18 @@ class App:
     """
     Pymunk target shooting simulation.
     """
-    def __init__(self):
+    def __init__(self, threaded: bool = False,
+                 metrics_port: Optional[int] = None,
+                 leak_tracker: Optional[LeakTracker] = None):
         pygame.init()
 
         self.running: bool = False
         self.playing: bool = False
+        self.threaded: bool = threaded
 
         self.fps: float = 0
         self.start_time: float = 0
+        self.last_frame_time: Optional[float] = None
 
         self.space = pymunk.Space()
 
@@ -41,6 +50,17 @@ class App:
 
         self.line_start_point: Optional[Vec2d] = None
 
+        self.worker: Optional[PhysicsWorker] = None
+
+        self.metrics: Optional[Metrics] = None
+        self.metrics_server: Optional[MetricsServer] = None
+
+        if metrics_port is not None:
+            self.metrics = Metrics()
+            self.metrics_server = MetricsServer(self.metrics, metrics_port)
+
+        self.leak_tracker: Optional[LeakTracker] = leak_tracker
+
     def setup(self):
         """
         Sets up the game's starting state.
@@ -58,8 +78,7 @@ class App:
         self.player.place()
         self.space.add(self.player, self.player.shape)
 
-        self.missile = Missile(self.player.position)
-        self.space.add(self.missile, self.missile.shape)
+        self.load_missile()
 
         self.flying_missiles = []
 
@@ -68,10 +87,39 @@ class App:
         Update the screen and the physics engine.
         :return: None
         """
-        left_mouse_press = 0
-
         self.add_collision_handlers()
 
+        try:
+            if self.metrics_server is not None:
+                self.metrics_server.start()
+
+            if self.threaded:
+                self.run_threaded()
+            else:
+                self.run_single_threaded()
+        finally:
+            self.finish()
+
+    def finish(self):
+        """
+        Stop the metrics server and write the leak report once the game loop
+        has ended, whether normally or with an exception.
+        :return: None
+        """
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+
+        if self.leak_tracker is not None:
+            self.leak_tracker.write_report(self)
+
+    def run_single_threaded(self):
+        """
+        Handle input, step the physics engine and draw the screen one after
+        another on this thread.
+        :return: None
+        """
+        left_mouse_press = 0
+
         while self.running:
             events = pygame.event.get()
             keys = pygame.key.get_pressed()
@@ -79,18 +127,13 @@ class App:
             self.handle_quit_event(events, keys)
 
             if not self.playing:
+                self.check_for_leaks()
+                self.tick()
                 continue
 
             self.handle_mouse_event(events)
             self.handle_key_input(keys)
-            self.aim()
-            self.update_targets()
-
-            for missile in self.flying_missiles:
-                missile.update_movement()
-
-                if missile.position.y >= self.gui.screen_height:
-                    self.flying_missiles.remove(missile)
+            self.update_simulation()
 
             self.gui.clear()
             self.space.debug_draw(self.draw_options)
@@ -106,8 +149,140 @@ class App:
             pygame.display.flip()
 
             self.fps = 60
-            self.space.step(1.0 / self.fps)
-            self.gui.clock.tick(self.fps)
+            self.step_space(1.0 / self.fps)
+            self.tick()
+
+    def run_threaded(self):
+        """
+        Update the screen on this thread while a physics worker steps the
+        simulation in the background. Input is queued to the worker as
+        commands and the screen is drawn from the worker's latest snapshot.
+        Raises the worker's exception if it stops unexpectedly.
+        :return: None
+        """
+        self.worker = PhysicsWorker(self)
+        self.worker.start()
+
+        try:
+            self.render_snapshots()
+        finally:
+            self.worker.stop()
+            self.worker.join()
+
+        if self.worker.error is not None:
+            raise self.worker.error
+
+    def render_snapshots(self):
+        """
+        Handle input and draw the physics worker's latest snapshot until the
+        game is quit or the worker stops.
+        :return: None
+        """
+        left_mouse_press = 0
+        self.fps = 60
+
+        while self.running:
+            if not self.worker.is_alive():
+                self.running = False
+                break
+
+            events = pygame.event.get()
+            keys = pygame.key.get_pressed()
+
+            self.handle_quit_event(events, keys)
+
+            snapshot = self.worker.snapshots.latest()
+
+            if snapshot is None:
+                self.tick()
+                continue
+
+            if not snapshot.playing:
+                self.gui.show_game_over_screen()
+                pygame.display.flip()
+                self.tick()
+                continue
+
+            self.handle_mouse_event(events)
+            self.handle_key_input(keys)
+
+            self.gui.clear()
+            self.gui.show_snapshot(snapshot)
+
+            if pygame.mouse.get_pressed()[left_mouse_press]:
+                self.show_power_meter()
+
+            self.gui.show_gui_data(snapshot.score, snapshot.hit_points)
+
+            if self.line_start_point is not None:
+                self.start_drawing_wall()
+
+            pygame.display.flip()
+
+            self.tick()
+
+    def step_space(self, dt: float):
+        """
+        Step the physics engine, recording the step duration and periodically
+        sampling object counts when metrics or leak tracking are enabled.
+        :param dt: Time step in seconds
+        :return: None
+        """
+        self.check_for_leaks()
+
+        if self.metrics is None:
+            self.space.step(dt)
+            return
+
+        start = time.perf_counter()
+        self.space.step(dt)
+        self.metrics.observe_step(time.perf_counter() - start)
+        self.metrics.maybe_sample(self)
+
+    def check_for_leaks(self):
+        """
+        Take a leak tracker checkpoint if one is due. Must be called from the
+        thread that steps the space.
+        :return: None
+        """
+        if self.leak_tracker is not None:
+            self.leak_tracker.maybe_checkpoint(self)
+
+    def tick(self):
+        """
+        Wait for the next frame, recording the time since the previous frame
+        when metrics are enabled.
+        :return: None
+        """
+        self.gui.clock.tick(self.fps)
+        now = time.perf_counter()
+
+        if self.metrics is not None and self.last_frame_time is not None:
+            self.metrics.observe_frame(now - self.last_frame_time)
+
+        self.last_frame_time = now
+
+    def update_simulation(self):
+        """
+        Advance the game state that changes once per physics step: spawning
+        and removing targets and applying drag to flying missiles.
+        :return: None
+        """
+        self.update_targets()
+
+        for missile in self.flying_missiles:
+            missile.update_movement()
+
+            if missile.position.y >= self.gui.screen_height:
+                self.flying_missiles.remove(missile)
+
+    def load_missile(self):
+        """
+        Place a new missile at the player's position, ready to be fired.
+        :return: None
+        """
+        self.missile = Missile(self.player.position)
+        self.space.add(self.missile, self.missile.shape)
 
     def start_drawing_wall(self):
         """
@@ -128,16 +303,16 @@ class App:
             [point_a, point_b]
         )
 
-    def finish_drawing_wall(self, end_point):
+    def add_wall(self, start_point, end_point):
         """
-        Draw a line segment between the current line start point and the given
-        end point
-        :param end_point: The point at which to end the line segment
+        Add a static wall segment between two points to the space.
+        :param start_point: The point at which to start the wall
+        :param end_point: The point at which to end the wall
         :return: None
         """
         wall = pymunk.Segment(
             self.space.static_body,
-            self.line_start_point,
+            start_point,
             end_point,
             radius=0.0
         )
@@ -189,7 +364,8 @@ class App:
     def handle_mouse_event(self, events):
         """
         Handle events triggered by mouse inputs. Charge and fire the arrow when
-        the user presses and releases the left mouse button.
+        the user presses and releases the left mouse button, and draw a wall
+        when they drag with the right mouse button.
         :param events: Pygame events currently occurring
         :return: None
         """
@@ -207,16 +383,53 @@ class App:
                     self.line_start_point = Vec2d(*e.pos)
             elif e.type == pygame.MOUSEBUTTONUP:
                 if e.button == left_click_event:
-                    self.fire()
-                    self.missile = Missile(self.player.position)
-                    self.space.add(self.missile, self.missile.shape)
+                    self.dispatch('fire', self.charge_shot())
                 elif (
                     e.button == right_click_event
                     and self.line_start_point is not None
                 ):
-                    self.finish_drawing_wall(e.pos)
+                    self.dispatch('wall', self.line_start_point, e.pos)
                     self.line_start_point = None
 
+    def dispatch(self, name: str, *args):
+        """
+        Apply an input command directly, or queue it for the physics worker
+        when running threaded.
+        :param name: Name of the command
+        :param args: Arguments for the command
+        :return: None
+        """
+        if self.worker is None:
+            self.apply_command(name, *args)
+        else:
+            self.worker.send(name, *args)
+
+    def apply_command(self, name: str, *args):
+        """
+        Apply an input command to the simulation. Must be called from the
+        thread that steps the space.
+        :param name: Name of the command
+        :param args: Arguments for the command
+        :return: None
+        """
+        if name == 'steer':
+            dx, dy, mouse_position = args
+
+            if dx or dy:
+                self.player.move(
+                    dx,
+                    dy,
+                    self.gui.screen_width,
+                    self.gui.screen_height
+                )
+
+            self.aim_at(mouse_position)
+        elif name == 'fire':
+            self.fire(*args)
+            self.load_missile()
+        elif name == 'wall':
+            self.add_wall(*args)
+
     def post_solve_missile_hit(self, arbiter, space, data):
         """
         Handles a collision between a missile and a target by calling a callback
@@ -228,6 +441,9 @@ class App:
         """
         impulse_len = 300
 
+        if self.metrics is not None:
+            self.metrics.count_collision('missile_hit')
+
         if arbiter.total_impulse.length > impulse_len:
             target, missile = arbiter.shapes
             missile.collision_type = 0
@@ -271,6 +487,9 @@ class App:
         :param data: Additional data for the callback
         :return: None
         """
+        if self.metrics is not None:
+            self.metrics.count_collision('player_hit')
+
         player, target = arbiter.shapes
         player_body = player.body
         target_body = target.body
@@ -309,43 +528,53 @@ class App:
         """
         self.playing = False
         self.space.remove(*self.space.bodies, *self.space.shapes)
-        self.gui.show_game_over_screen()
-        pygame.display.flip()
+
+        if self.metrics is not None:
+            self.metrics.sample(self)
+
+        if self.worker is None:
+            self.gui.show_game_over_screen()
+            pygame.display.flip()
 
     def handle_key_input(self, keys):
         """
         Handle events triggered by keypress inputs. Move the player with arrow
-        keys and WASD, and save a screenshot with P.
+        keys and WASD, aim the missile with the mouse, and save a screenshot
+        with P.
+        :param keys: Keys currently pressed.
         :return: None
         """
-        max_x = self.gui.screen_width
-        max_y = self.gui.screen_height
+        dx = 0
+        dy = 0
 
         if keys[pygame.K_UP] or keys[pygame.K_w]:
-            self.player.move(0, -1, max_x, max_y)
+            dy -= 1
 
         if keys[pygame.K_DOWN] or keys[pygame.K_s]:
-            self.player.move(0, 1, max_x, max_y)
+            dy += 1
 
         if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            self.player.move(-1, 0, max_x, max_y)
+            dx -= 1
 
         if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            self.player.move(1, 0, max_x, max_y)
+            dx += 1
 
         if keys[pygame.K_p]:
             pygame.image.save(self.gui.screen, 'shooter.png')
 
-    def aim(self):
-        """
-        Aim the missile with the mouse.
-        :return: None
-        """
         mouse_position = pymunk.pygame_util.from_pygame(
             Vec2d(*pygame.mouse.get_pos()),
             self.gui.screen
         )
 
+        self.dispatch('steer', dx, dy, mouse_position)
+
+    def aim_at(self, mouse_position):
+        """
+        Aim the missile at the given mouse position.
+        :param mouse_position: Mouse position in space coordinates
+        :return: None
+        """
         missile_offset = Vec2d(self.player.shape.radius + 40, 0)
 
         self.player.angle = (mouse_position - self.player.position).angle
@@ -355,13 +584,15 @@ class App:
 
         self.missile.angle = self.player.angle
 
-    def fire(self):
+    def fire(self, charge: float):
         """
         Fire a charged missile.
+        :param charge: Charge of the shot, measured by charge_shot on the input
+        thread
         :return: None
         """
         power = 13.5
-        charge = self.charge_shot() * power
+        charge = charge * power
         impulse = charge * Vec2d(1, 0)
         impulse = impulse.rotated(self.missile.angle)
 
@@ -449,7 +680,55 @@ class App:
 
 
 def main():
-    game = App()
+    parser = argparse.ArgumentParser(description=App.__doc__.strip())
+    parser.add_argument(
+        '--threaded',
+        action='store_true',
+        help='step the physics on a background thread'
+    )
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=None,
+        help='serve live metrics on this localhost port'
+    )
+    parser.add_argument(
+        '--leak-check',
+        action='store_true',
+        help='track object counts and memory use and write a report at exit'
+    )
+    parser.add_argument(
+        '--leak-interval',
+        type=float,
+        default=30,
+        help='seconds between leak tracker checkpoints'
+    )
+    parser.add_argument(
+        '--leak-report',
+        default='leak_report.txt',
+        help='file the leak tracker report is written to'
+    )
+    parser.add_argument(
+        '--tracemalloc',
+        action='store_true',
+        help='include tracemalloc allocation diffs in the leak report'
+    )
+    args = parser.parse_args()
+
+    leak_tracker = None
+
+    if args.leak_check:
+        leak_tracker = LeakTracker(
+            interval=args.leak_interval,
+            trace_malloc=args.tracemalloc,
+            report_path=args.leak_report
+        )
+
+    game = App(
+        threaded=args.threaded,
+        metrics_port=args.metrics_port,
+        leak_tracker=leak_tracker
+    )
     game.setup()
     game.run()
 
@@ -0,0 +1,246 @@
+import bisect
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+
+class Histogram:
+    """
+    Cumulative histogram of durations in seconds, in the shape Prometheus
+    expects.
+    """
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """
+        Record a single value.
+        :param value: Duration in seconds
+        :return: None
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Get the cumulative count for each bucket's upper bound.
+        :return: List of (upper bound, count) pairs, ending with '+Inf'
+        """
+        bounds = [str(b) for b in self.buckets] + ['+Inf']
+        running = 0
+        result = []
+
+        for bound, count in zip(bounds, self.counts):
+            running += count
+            result.append((bound, running))
+
+        return result
+
+
+class Metrics:
+    """
+    Live simulation counters. The game loop records cheap values every frame
+    and samples object counts periodically; the exporter only ever reads the
+    stored values.
+    """
+    duration_buckets = (
+        0.001, 0.0025, 0.005, 0.01, 0.0167, 0.025, 0.0333, 0.05, 0.1, 0.25
+    )
+
+    def __init__(self, sample_interval: int = 60):
+        self.sample_interval = sample_interval
+
+        self._lock = threading.Lock()
+        self._frames_to_sample = 0
+
+        self.frame_time = Histogram(self.duration_buckets)
+        self.step_duration = Histogram(self.duration_buckets)
+        self.collisions: Dict[str, int] = {
+            'missile_hit': 0,
+            'player_hit': 0,
+        }
+        self.gauges: Dict[str, float] = {}
+
+    def observe_frame(self, seconds: float):
+        """
+        Record the time taken by one frame.
+        :param seconds: Frame time in seconds
+        :return: None
+        """
+        with self._lock:
+            self.frame_time.observe(seconds)
+
+    def observe_step(self, seconds: float):
+        """
+        Record the time taken by one call to space.step.
+        :param seconds: Step duration in seconds
+        :return: None
+        """
+        with self._lock:
+            self.step_duration.observe(seconds)
+
+    def count_collision(self, kind: str):
+        """
+        Count a collision callback.
+        :param kind: Name of the collision handler
+        :return: None
+        """
+        with self._lock:
+            self.collisions[kind] += 1
+
+    def maybe_sample(self, app):
+        """
+        Sample the game's object counts once every sample_interval calls. Must
+        be called from the thread that steps the space.
+        :param app: The running App
+        :return: None
+        """
+        self._frames_to_sample -= 1
+
+        if self._frames_to_sample > 0:
+            return
+
+        self.sample(app)
+
+    def sample(self, app):
+        """
+        Sample the game's object counts now. Must be called from the thread
+        that steps the space.
+        :param app: The running App
+        :return: None
+        """
+        self._frames_to_sample = self.sample_interval
+
+        gauges = {
+            'targets': len(app.targets),
+            'flying_missiles': len(app.flying_missiles),
+            'walls': len(app.space.static_body.shapes),
+            'space_bodies': len(app.space.bodies),
+            'space_shapes': len(app.space.shapes),
+            'score': app.player.score,
+            'hit_points': app.player.hit_points,
+            'playing': int(app.playing),
+        }
+
+        with self._lock:
+            self.gauges = gauges
+
+    def as_dict(self) -> dict:
+        """
+        Get a copy of all metrics as plain data.
+        :return: Dictionary of metrics
+        """
+        with self._lock:
+            return {
+                'frame_time_seconds': self._histogram_dict(self.frame_time),
+                'step_duration_seconds': self._histogram_dict(
+                    self.step_duration
+                ),
+                'collisions': dict(self.collisions),
+                'gauges': dict(self.gauges),
+            }
+
+    def as_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+        :return: Metrics text
+        """
+        data = self.as_dict()
+        lines = []
+
+        for name in ('frame_time_seconds', 'step_duration_seconds'):
+            histogram = data[name]
+            metric = f'shooter_{name}'
+            lines.append(f'# TYPE {metric} histogram')
+
+            for bound, count in histogram['buckets']:
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+
+            lines.append(f'{metric}_sum {histogram["sum"]}')
+            lines.append(f'{metric}_count {histogram["count"]}')
+
+        lines.append('# TYPE shooter_collisions_total counter')
+
+        for kind, count in data['collisions'].items():
+            lines.append(f'shooter_collisions_total{{kind="{kind}"}} {count}')
+
+        for name, value in data['gauges'].items():
+            lines.append(f'# TYPE shooter_{name} gauge')
+            lines.append(f'shooter_{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram_dict(histogram: Histogram) -> dict:
+        return {
+            'buckets': histogram.cumulative(),
+            'sum': histogram.total,
+            'count': histogram.count,
+        }
+
+
+class MetricsServer:
+    """
+    Serves metrics on a localhost port from a background thread. GET /metrics
+    returns Prometheus text and GET /metrics.json returns JSON.
+    """
+    def __init__(self, metrics: Metrics, port: int,
+                 host: str = '127.0.0.1'):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        Start serving metrics in a daemon thread.
+        :return: None
+        """
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = metrics.as_prometheus().encode()
+                    content_type = 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body = json.dumps(metrics.as_dict()).encode()
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name='metrics',
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop serving metrics.
+        :return: None
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,248 @@
+import queue
+import threading
+import time
+
+import pymunk
+
+from typing import NamedTuple, Optional, Tuple
+
+
+class ShapeSnapshot(NamedTuple):
+    """
+    Immutable copy of the data needed to draw a single Pymunk shape.
+    """
+    kind: str
+    points: Tuple[Tuple[float, float], ...]
+    radius: float
+    angle: float
+    color: Tuple[int, int, int, int]
+
+
+class RenderSnapshot(NamedTuple):
+    """
+    Immutable copy of everything the render thread needs to draw one frame.
+    """
+    frame: int
+    shapes: Tuple[ShapeSnapshot, ...]
+    score: int
+    hit_points: int
+    playing: bool
+
+
+class SnapshotBuffer:
+    """
+    Double buffer of render snapshots shared by the physics worker and the
+    render thread. The worker writes into the back slot and then swaps it to
+    the front, so the render thread always reads a complete snapshot.
+    """
+    def __init__(self):
+        self._slots: list = [None, None]
+        self._front = 0
+        self._lock = threading.Lock()
+
+    def publish(self, snapshot: RenderSnapshot):
+        """
+        Store a new snapshot in the back slot and make it the front slot.
+        :param snapshot: The snapshot to publish
+        :return: None
+        """
+        back = 1 - self._front
+        self._slots[back] = snapshot
+
+        with self._lock:
+            self._front = back
+
+    def latest(self) -> Optional[RenderSnapshot]:
+        """
+        Get the most recently published snapshot.
+        :return: The front snapshot, or None if nothing has been published yet
+        """
+        with self._lock:
+            return self._slots[self._front]
+
+
+def shape_color(shape: pymunk.Shape) -> Tuple[int, int, int, int]:
+    """
+    Pick the color a shape is drawn with, following the defaults used by
+    Pymunk's debug draw.
+    :param shape: The shape to draw
+    :return: RGBA color tuple
+    """
+    if hasattr(shape, 'color'):
+        return tuple(shape.color)
+
+    body_type = shape.body.body_type
+
+    if body_type == pymunk.Body.STATIC:
+        return 149, 165, 166, 255
+    elif body_type == pymunk.Body.KINEMATIC:
+        return 39, 174, 96, 255
+
+    return 52, 152, 219, 255
+
+
+def take_snapshot(space: pymunk.Space, frame: int, score: int, hp: int,
+                  playing: bool) -> RenderSnapshot:
+    """
+    Copy the drawable state of a space into a render snapshot.
+    :param space: Pymunk Space to copy
+    :param frame: Number of the physics step the snapshot was taken after
+    :param score: The player's current score
+    :param hp: The player's current hit points
+    :param playing: Whether the game is still in progress
+    :return: The render snapshot
+    """
+    shapes = []
+
+    for shape in space.shapes:
+        body = shape.body
+        color = shape_color(shape)
+
+        if isinstance(shape, pymunk.Circle):
+            center = body.local_to_world(shape.offset)
+            shapes.append(ShapeSnapshot(
+                'circle',
+                ((center.x, center.y),),
+                shape.radius,
+                body.angle,
+                color
+            ))
+        elif isinstance(shape, pymunk.Poly):
+            vertices = tuple(
+                (v.x, v.y) for v in
+                (body.local_to_world(v) for v in shape.get_vertices())
+            )
+            shapes.append(ShapeSnapshot(
+                'poly',
+                vertices,
+                shape.radius,
+                body.angle,
+                color
+            ))
+        elif isinstance(shape, pymunk.Segment):
+            a = body.local_to_world(shape.a)
+            b = body.local_to_world(shape.b)
+            shapes.append(ShapeSnapshot(
+                'segment',
+                ((a.x, a.y), (b.x, b.y)),
+                shape.radius,
+                body.angle,
+                color
+            ))
+
+    return RenderSnapshot(frame, tuple(shapes), score, hp, playing)
+
+
+class PhysicsWorker(threading.Thread):
+    """
+    Background thread that owns the game's Pymunk Space. It applies input
+    commands queued by the render thread, steps the simulation at a fixed rate
+    and publishes a render snapshot after every step.
+    """
+    def __init__(self, app, step_rate: float = 60):
+        super(PhysicsWorker, self).__init__(name='physics', daemon=True)
+
+        self.app = app
+        self.step_rate = step_rate
+        self.frame = 0
+
+        self.commands: queue.Queue = queue.Queue()
+        self.snapshots = SnapshotBuffer()
+
+        self.error: Optional[Exception] = None
+
+        self._steer: Optional[tuple] = None
+        self._stop_event = threading.Event()
+
+    def send(self, name: str, *args):
+        """
+        Queue a command for the physics thread.
+        :param name: Name of the command
+        :param args: Arguments for the command
+        :return: None
+        """
+        self.commands.put((name, args))
+
+    def stop(self):
+        """
+        Ask the worker to stop after the current step.
+        :return: None
+        """
+        self._stop_event.set()
+
+    def process_commands(self):
+        """
+        Apply every queued command to the game. The latest 'steer' command is
+        kept and applied on every step, so held keys move the player at the
+        physics step rate however fast the render thread sends them.
+        :return: None
+        """
+        while True:
+            try:
+                name, args = self.commands.get_nowait()
+            except queue.Empty:
+                break
+
+            if name == 'steer':
+                self._steer = args
+            elif self.app.playing:
+                self.app.apply_command(name, *args)
+
+        if self._steer is not None and self.app.playing:
+            self.app.apply_command('steer', *self._steer)
+
+    def publish(self):
+        """
+        Publish a snapshot of the current simulation state.
+        :return: None
+        """
+        self.snapshots.publish(take_snapshot(
+            self.app.space,
+            self.frame,
+            self.app.player.score,
+            self.app.player.hit_points,
+            self.app.playing
+        ))
+
+    def run(self):
+        """
+        Step the simulation at a fixed rate until stopped. An exception raised
+        while stepping ends the thread and is kept in error for the render
+        thread to raise.
+        :return: None
+        """
+        try:
+            self.step_until_stopped()
+        except Exception as e:
+            self.error = e
+
+    def step_until_stopped(self):
+        """
+        Apply commands, step the simulation and publish a snapshot at a fixed
+        rate until stopped.
+        :return: None
+        """
+        dt = 1.0 / self.step_rate
+        next_step = time.perf_counter()
+
+        self.publish()
+
+        while not self._stop_event.is_set():
+            self.process_commands()
+
+            if self.app.playing:
+                self.app.update_simulation()
+                self.app.step_space(dt)
+                self.frame += 1
+            else:
+                self.app.check_for_leaks()
+
+            self.publish()
+
+            next_step += dt
+            delay = next_step - time.perf_counter()
+
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                next_step = time.perf_counter()